@@ -1,6 +1,12 @@
+import matplotlib.pyplot as plt
+import numpy as np
 import pytest
+from matplotlib.patches import StepPatch
+from PIL import Image
 
 import tol_stack
+import tol_stack.stack
+from tol_stack.histogram import histogram
 
 
 def test_creation():
@@ -17,3 +23,247 @@ def test_invalid_distribution():
         tol_stack.Part(
             name='part', nominal_length=0.0, tolerance=0.05, distribution='invalid dist'
         )
+
+
+def test_missing_image_path():
+    with pytest.raises(FileNotFoundError):
+        tol_stack.Part(name='part', nominal_length=0.0, tolerance=0.05,
+                       image_paths='missing.png')
+
+
+def test_assigned_images():
+    image = Image.new('RGB', (10, 10))
+    part = tol_stack.Part(name='part', nominal_length=0.0, tolerance=0.05)
+    part.images = [image]
+    assert part.images == [image]
+
+    stack = tol_stack.StackPath()
+    stack.images = [image]
+    assert stack.images == [image]
+
+
+@pytest.fixture
+def make_stack():
+    """
+    Returns a factory for a stack path of a normal part and a skewed part; \
+    any keyword arguments are passed on to the stack path.
+    """
+    def make(**kwargs):
+        stack = tol_stack.StackPath(**{'size': 1000, 'max_length': 1.0, **kwargs})
+        stack.add_part(tol_stack.Part(name='part0', nominal_length=1.0, tolerance=0.01))
+        stack.add_part(tol_stack.Part(name='part1', distribution='skew-norm', skewiness=2,
+                                      nominal_length=-0.5, tolerance=0.02))
+        return stack
+
+    return make
+
+
+def final_stackup(stack):
+    """
+    Draws the length distribution of the stack path and returns the counts \
+    and edges of its final stackup plot.
+    """
+    fig = stack.show_length_dist()
+    stairs, = [patch for patch in fig.axes[2].patches if isinstance(patch, StepPatch)]
+    counts, edges, _ = stairs.get_data()
+    plt.close(fig)
+
+    return counts, edges
+
+
+def assert_final_is_sum_of_lengths(stack):
+    counts, edges = final_stackup(stack)
+    expected, expected_edges = histogram(sum(part.lengths for part in stack.parts))
+
+    assert (counts == expected).all()
+    assert (edges == expected_edges).all()
+
+
+def test_seeded_stack_path_is_repeatable(make_stack):
+    lengths = []
+    for _ in range(2):
+        stack = make_stack(seed=1234)
+        final_stackup(stack)
+        lengths.append([part.lengths.copy() for part in stack.parts])
+
+    for first, second in zip(*lengths):
+        assert (first == second).all()
+
+
+def test_refresh_skips_unchanged_parts(make_stack):
+    stack = make_stack()
+    final_stackup(stack)
+    part0, part1 = [part.lengths.copy() for part in stack.parts]
+
+    stack.parts[1].tolerance = 0.04
+    assert_final_is_sum_of_lengths(stack)
+
+    assert (stack.parts[0].lengths == part0).all()
+    assert not (stack.parts[1].lengths == part1).all()
+
+
+def test_size_changed_after_adding_parts(make_stack):
+    stack = make_stack()
+    stack.size = 2000
+    counts, _ = final_stackup(stack)
+
+    assert counts.sum() == 2000
+    for part in stack.parts:
+        assert part.lengths.size == 2000
+
+
+def test_invalidate_resamples_all_parts(make_stack):
+    stack = make_stack()
+    final_stackup(stack)
+    lengths = [part.lengths.copy() for part in stack.parts]
+
+    final_stackup(stack)
+    for before, part in zip(lengths, stack.parts):
+        assert (part.lengths == before).all()
+
+    stack.invalidate()
+    assert_final_is_sum_of_lengths(stack)
+    for before, part in zip(lengths, stack.parts):
+        assert not (part.lengths == before).any()
+
+
+def test_length_dist_is_sum_of_part_lengths(make_stack):
+    assert_final_is_sum_of_lengths(make_stack())
+
+
+def test_parts_refreshed_directly_are_included_in_length_dist(make_stack):
+    stack = make_stack()
+    final_stackup(stack)
+
+    stack.parts[1].refresh()
+    assert_final_is_sum_of_lengths(stack)
+
+
+def test_parts_resampled_for_concentricity_are_included_in_length_dist():
+    stack = tol_stack.StackPath(size=1000, stratified=True, concentricity=0.01)
+    for i in range(2):
+        stack.add_part(tol_stack.Part(name=f'part{i}', nominal_length=1.0, tolerance=0.01,
+                                      concentricity=0.005))
+    final_stackup(stack)
+
+    stack.parts[1].tolerance = 0.5
+    plt.close(stack.show_concentricity_dist())
+    assert_final_is_sum_of_lengths(stack)
+    assert stack.parts[1].lengths.std() == pytest.approx(0.5 / 3, rel=0.05)
+
+
+def test_histogram_counts_every_sample():
+    values = np.random.default_rng(0).normal(size=1000)
+    counts, edges = histogram(values, bins=31)
+
+    assert counts.sum() == values.size
+    assert len(edges) == 32
+    assert edges[0] == values.min()
+
+
+def test_histogram_density():
+    values = np.random.default_rng(0).normal(size=1000)
+    density, edges = histogram(values, bins=31, density=True)
+    expected, _ = np.histogram(values, bins=edges, density=True)
+
+    assert (density * np.diff(edges)).sum() == pytest.approx(1.0)
+    assert density == pytest.approx(expected)
+
+
+def test_concentricity_out_of_range_is_radial():
+    stack = tol_stack.StackPath(concentricity=0.01, size=2000, seed=0)
+    for i in range(3):
+        stack.add_part(tol_stack.Part(name=f'part{i}', concentricity=0.01))
+
+    fig = stack.show_concentricity_dist()
+    texts = [text.get_text() for ax in fig.axes for text in ax.texts]
+    percent = float(texts[0].split('%')[0])
+    plt.close(fig)
+
+    finals = sum(part.concentricities for part in stack.parts)
+    expected = 100 * np.count_nonzero(abs(finals) >= 0.01) / finals.size
+    assert percent == pytest.approx(expected, abs=0.01)
+
+
+def test_parallel_sampling_matches_serial_sampling(make_stack, monkeypatch):
+    # sampling is only spread over processes for large stack paths on
+    # machines with several cores
+    monkeypatch.setattr(tol_stack.stack, '_parallel_size', 100)
+    monkeypatch.setattr(tol_stack.stack.os, 'cpu_count', lambda: 2)
+
+    lengths = []
+    for parallel in (False, True):
+        stack = make_stack(seed=0, parallel=parallel)
+        stack.add_part(tol_stack.Part(name='part2', distribution='skew-norm', skewiness=2,
+                                      nominal_length=-0.5, tolerance=0.02))
+        assert_final_is_sum_of_lengths(stack)
+        lengths.append([part.lengths.copy() for part in stack.parts])
+
+    for serial, parallel in zip(*lengths):
+        assert (serial == parallel).all()
+    assert not (lengths[0][1] == lengths[0][2]).all()
+
+
+def test_single_precision_stack_path(make_stack):
+    stack = make_stack(dtype=np.float32)
+    final_stackup(stack)
+
+    for part in stack.parts:
+        assert part.lengths.dtype == np.float32
+
+
+
+def test_single_precision_part():
+    part = tol_stack.Part(name='part', distribution='norm-gt', limits=0.995,
+                          nominal_length=1.0, tolerance=0.01, dtype=np.float32)
+    assert part.lengths.dtype == np.float32
+
+    part = tol_stack.Part(name='part', concentricity=0.005, dtype=np.float32)
+    assert part.concentricities.dtype == np.complex64
+
+
+def test_render_dists():
+    stack = tol_stack.StackPath(size=1000, max_length=2.0, concentricity=0.01)
+    stack.add_part(tol_stack.Part(name='part0', nominal_length=1.0, tolerance=0.01,
+                                  concentricity=0.005))
+    stack.add_part(tol_stack.Part(name='part1', nominal_length=0.5, tolerance=0.01,
+                                  concentricity=0.005))
+    images = stack.render_dists()
+
+    assert set(images) == {'part_relative_dists', 'length_dist', 'concentricity_dist'}
+    for image in images.values():
+        assert image.startswith(b'\x89PNG')
+
+
+def test_length_moments_match_samples():
+    part = tol_stack.Part(name='part', distribution='norm-screened', limits=(0.995, 1.02),
+                          nominal_length=1.0, tolerance=0.01, size=200000)
+    mean, std = part.length_moments()
+
+    assert mean == pytest.approx(part.lengths.mean(), abs=1e-4)
+    assert std == pytest.approx(part.lengths.std(), rel=0.01)
+
+
+def test_analytic_length_interference_matches_simulation():
+    stack = tol_stack.StackPath(size=200000, seed=0, min_length=0.002, max_length=0.01)
+    stack.add_part(tol_stack.Part(name='part0', nominal_length=1.0, tolerance=0.01))
+    stack.add_part(tol_stack.Part(name='part1', nominal_length=-0.995, tolerance=0.01))
+    below, above = stack.calculate_length_interference()
+
+    final_stackup(stack)
+    finals = sum(part.lengths for part in stack.parts)
+    assert below == pytest.approx(np.mean(finals < 0.002), abs=0.005)
+    assert above == pytest.approx(np.mean(finals > 0.01), abs=0.005)
+
+
+def test_stratified_lengths_match_moments():
+    stack = tol_stack.StackPath(size=1000, seed=0, stratified=True)
+    stack.add_part(tol_stack.Part(name='part0', nominal_length=1.0, tolerance=0.01))
+    stack.add_part(tol_stack.Part(name='part1', distribution='norm-notched',
+                                  limits=(0.498, 0.501), nominal_length=0.5, tolerance=0.01))
+    final_stackup(stack)
+
+    for part in stack.parts:
+        mean, std = part.length_moments()
+        assert mean == pytest.approx(part.lengths.mean(), abs=1e-5)
+        assert std == pytest.approx(part.lengths.std(), rel=0.01)
@@ -1,25 +1,72 @@
+"""
+Samplers for the distributions which a part may follow.
+
+Each sampler draws from the ``numpy.random.Generator`` passed as ``rng``,
+rather than from the global ``numpy.random`` state, so
+``numpy.random.seed()`` has no effect on the samples.  For repeatable
+samples, pass a seeded generator such as ``np.random.default_rng(1234)``.
+"""
 from typing import Tuple
 import numpy as np
 from scipy.stats import skewnorm
 
 _max_iterations = 100
 
+# used when no generator is specified; it is unseeded and independent
+# of the global numpy.random state
+_default_rng = np.random.default_rng()
 
-def norm(loc: float, scale: float, size: int) -> np.ndarray:
+
+def stratified_uniform(size: int,
+                       rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Returns a stratified random sampling of the uniform distribution
+    between 0 and 1; exactly one sample falls within each of ``size``
+    equal strata, in random order.  Mapping these through the inverse
+    cumulative distribution of another distribution gives a Latin
+    hypercube sampling of that distribution.
+
+    :param size: the number of samples, which is also the number of strata
+    :param rng: the random generator from which to draw the samples; \
+    when not specified, a module-level generator is used
+    :return: a numpy array of values between 0 and 1
+    """
+    rng = rng if rng is not None else _default_rng
+
+    values = rng.permutation(size) + rng.random(size)
+    values /= size
+
+    return values
+
+
+def norm(loc: float, scale: float, size: int,
+         rng: np.random.Generator = None,
+         out: np.ndarray = None) -> np.ndarray:
     """
     Returns a random sampling from the normal distribution.
 
     :param loc: the nominal value
     :param scale: the range of common lengths
     :param size: the number of samples within the common lengths
+    :param rng: the random generator from which to draw the samples; \
+    when not specified, a module-level generator is used
+    :param out: an existing array of ``size`` samples into which the \
+    lengths are written in place of allocating a new array
     :return: a numpy array of lengths
     """
-    return np.random.normal(loc=loc, scale=scale, size=size)
+    rng = rng if rng is not None else _default_rng
+
+    dtype = out.dtype if out is not None else np.float64
+    values = rng.standard_normal(size=size, dtype=dtype, out=out)
+    values *= scale
+    values += loc
+
+    return values
 
 
 def norm_screened(loc: float, scale: float,
-                  limits: Tuple[float, float], size: int) \
-        -> np.ndarray:
+                  limits: Tuple[float, float], size: int,
+                  rng: np.random.Generator = None) -> np.ndarray:
     """
     Returns a random sampling from the normal distribution
     which has been screened.  This is a common distribution when
@@ -30,9 +77,13 @@ def norm_screened(loc: float, scale: float,
     :param limits: a tuple of floats containing the low \
     and high screening limits
     :param size: the number of samples within the common lengths
+    :param rng: the random generator from which to draw the samples; \
+    when not specified, a module-level generator is used
     :return: a numpy array of lengths
     """
-    values = np.random.normal(loc=loc, scale=scale, size=size)
+    rng = rng if rng is not None else _default_rng
+
+    values = rng.normal(loc=loc, scale=scale, size=size)
 
     if limits is not None:
         if len(limits) != 2:
@@ -44,9 +95,9 @@ def norm_screened(loc: float, scale: float,
         values = values[(values >= low_limit) & (values <= high_limit)]
         count = 0
         while len(values) < size:
-            values = np.append(values, np.random.normal(loc=loc,
-                                                        scale=scale,
-                                                        size=size))
+            values = np.append(values, rng.normal(loc=loc,
+                                                  scale=scale,
+                                                  size=size))
             values = values[(values >= low_limit) & (values <= high_limit)]
             count += 1
             if count > _max_iterations:
@@ -60,7 +111,8 @@ def norm_screened(loc: float, scale: float,
 
 
 def norm_notched(loc: float, scale: float,
-                 limits: Tuple[float, float], size: int) -> np.ndarray:
+                 limits: Tuple[float, float], size: int,
+                 rng: np.random.Generator = None) -> np.ndarray:
     """
     Returns a random sampling from the normal distribution
     which has been screened in order to remove the nominal lengths.  This is a
@@ -72,10 +124,13 @@ def norm_notched(loc: float, scale: float,
     :param limits: a tuple of floats containing the low \
     and high screening limits
     :param size: the number of samples within the common lengths
+    :param rng: the random generator from which to draw the samples; \
+    when not specified, a module-level generator is used
     :return: a numpy array of lengths
     """
+    rng = rng if rng is not None else _default_rng
 
-    values = np.random.normal(loc=loc, scale=scale, size=size)
+    values = rng.normal(loc=loc, scale=scale, size=size)
 
     if limits is not None:
         if len(limits) != 2:
@@ -88,7 +143,7 @@ def norm_notched(loc: float, scale: float,
 
         count = 0
         while len(values) < size:
-            values = np.append(values, np.random.normal(loc=loc, scale=scale, size=size))
+            values = np.append(values, rng.normal(loc=loc, scale=scale, size=size))
             values = values[(values <= low_limit) | (values >= high_limit)]
 
             count += 1
@@ -102,7 +157,8 @@ def norm_notched(loc: float, scale: float,
     return values
 
 
-def norm_lt(loc: float, scale: float, limit: float, size: int) -> np.ndarray:
+def norm_lt(loc: float, scale: float, limit: float, size: int,
+            rng: np.random.Generator = None) -> np.ndarray:
     """
     Returns a random sampling from the normal distribution
     which has been screened in order to remove lengths above the limit.
@@ -111,19 +167,23 @@ def norm_lt(loc: float, scale: float, limit: float, size: int) -> np.ndarray:
     :param scale: the range of common lengths
     :param limit: a floats containing the upper screening limit
     :param size: the number of samples within the common lengths
+    :param rng: the random generator from which to draw the samples; \
+    when not specified, a module-level generator is used
     :return: a numpy array of lengths
     """
-    values = np.random.normal(loc=loc, scale=scale,
-                              size=size)
+    rng = rng if rng is not None else _default_rng
+
+    values = rng.normal(loc=loc, scale=scale,
+                        size=size)
 
     # removes lengths not in range
     values = values[values <= limit]
 
     count = 0
     while len(values) < size:
-        values = np.append(values, np.random.normal(loc=loc,
-                                                    scale=scale,
-                                                    size=size))
+        values = np.append(values, rng.normal(loc=loc,
+                                              scale=scale,
+                                              size=size))
         values = values[(values <= limit)]
 
         count += 1
@@ -136,7 +196,8 @@ def norm_lt(loc: float, scale: float, limit: float, size: int) -> np.ndarray:
     return values
 
 
-def norm_gt(loc: float, scale: float, limit: float, size: int) -> np.ndarray:
+def norm_gt(loc: float, scale: float, limit: float, size: int,
+            rng: np.random.Generator = None) -> np.ndarray:
     """
     Returns a random sampling from the normal distribution
     which has been screened in order to remove lengths below the limit.
@@ -145,18 +206,22 @@ def norm_gt(loc: float, scale: float, limit: float, size: int) -> np.ndarray:
     :param scale: the range of common lengths
     :param limit: a floats containing the lower screening limit
     :param size: the number of samples within the common lengths
+    :param rng: the random generator from which to draw the samples; \
+    when not specified, a module-level generator is used
     :return: a numpy array of lengths
     """
-    values = np.random.normal(loc=loc, scale=scale, size=size)
+    rng = rng if rng is not None else _default_rng
+
+    values = rng.normal(loc=loc, scale=scale, size=size)
 
     # removes lengths not in range
     values = values[values >= limit]
 
     count = 0
     while len(values) < size:
-        values = np.append(values, np.random.normal(loc=loc,
-                                                    scale=scale,
-                                                    size=size))
+        values = np.append(values, rng.normal(loc=loc,
+                                              scale=scale,
+                                              size=size))
         values = values[(values >= limit)]
 
         count += 1
@@ -171,7 +236,8 @@ def norm_gt(loc: float, scale: float, limit: float, size: int) -> np.ndarray:
 
 
 def skew_normal(skewiness: float, loc: float,
-                scale: float, size: int) -> np.ndarray:
+                scale: float, size: int,
+                rng: np.random.Generator = None) -> np.ndarray:
     """
     Returns a random sampling from skewnormal distribution.
 
@@ -181,10 +247,14 @@ def skew_normal(skewiness: float, loc: float,
     :param loc: the nominal value
     :param scale: the range of common lengths
     :param size: the number of samples within the common lengths
+    :param rng: the random generator from which to draw the samples; \
+    when not specified, a module-level generator is used
     :return: a numpy array of lengths
     """
-    values = skewnorm.rvs(skewiness, loc=loc, scale=scale, size=size)\
-        .astype(np.float64)
+    rng = rng if rng is not None else _default_rng
+
+    values = skewnorm.rvs(skewiness, loc=loc, scale=scale, size=size,
+                          random_state=rng).astype(np.float64)
 
     return values
 
@@ -0,0 +1,106 @@
+from typing import Tuple
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+try:
+    import fast_histogram
+except ImportError:
+    fast_histogram = None
+
+
+def histogram(values: np.ndarray, bins: int = 31,
+              limits: Tuple[float, float] = None, density: bool = False) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the counts and edges of a histogram of uniformly-sized bins.
+    When the optional ``fast-histogram`` package is installed, it is used
+    in place of ``numpy.histogram``, which must search for the bin of
+    each sample.
+
+    :param values: the samples to be binned
+    :param bins: the number of bins; a sequence of bin edges is also \
+    accepted, but will always be binned using numpy
+    :param limits: a tuple of floats containing the low and high edges \
+    of the bins; when not specified, the range of the values is used
+    :param density: when True, the counts are normalized to a probability \
+    density, so that histograms of different ranges are comparable
+    :return: a tuple containing the counts and the bin edges
+    """
+    if not isinstance(bins, (int, np.integer)):
+        return np.histogram(values, bins=bins, density=density)
+
+    if limits is None:
+        limits = values.min(), values.max()
+    low_limit, high_limit = limits
+    if low_limit == high_limit:
+        low_limit, high_limit = low_limit - 0.5, high_limit + 0.5
+
+    if fast_histogram is None:
+        return np.histogram(values, bins=bins,
+                            range=(low_limit, high_limit), density=density)
+
+    # fast-histogram excludes values at the high edge, which numpy
+    # includes, so the high edge is nudged up to keep the maximum
+    high_limit = np.nextafter(high_limit, np.inf)
+    counts = fast_histogram.histogram1d(values, bins=bins,
+                                        range=(low_limit, high_limit))
+    edges = np.linspace(low_limit, high_limit, bins + 1)
+
+    if density:
+        return counts / (counts.sum() * np.diff(edges)), edges
+
+    return counts.astype(np.int64), edges
+
+
+def show_histogram(ax: plt.Axes, values: np.ndarray, bins: int = 31,
+                   limits: Tuple[float, float] = None,
+                   density: bool = False, **kwargs) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bins the values and draws the histogram on the axis as a single
+    stepped line, rather than as a patch for every bin.
+
+    :param ax: the axis on which to draw the histogram
+    :param values: the samples to be binned
+    :param bins: the number of bins
+    :param limits: a tuple of floats containing the low and high edges \
+    of the bins; when not specified, the range of the values is used
+    :param density: when True, the counts are normalized to a probability \
+    density, so that histograms of different ranges are comparable
+    :param kwargs: All keyword arguments must be valid for \
+    matplotlib.pyplot.stairs
+    :return: a tuple containing the counts and the bin edges
+    """
+    counts, edges = histogram(values, bins=bins, limits=limits,
+                              density=density)
+    ax.stairs(counts, edges, **kwargs)
+
+    return counts, edges
+
+
+def histogram2d(x: np.ndarray, y: np.ndarray, bins: int,
+                limits: Tuple[float, float]) -> np.ndarray:
+    """
+    Returns the counts of a square, two-dimensional histogram of
+    uniformly-sized bins, using the optional ``fast-histogram`` package
+    when it is installed.
+
+    :param x: the horizontal position of the samples
+    :param y: the vertical position of the samples
+    :param bins: the number of bins along each axis
+    :param limits: a tuple of floats containing the low and high edges \
+    of the bins, applied to both axes
+    :return: an array of counts, indexed by the x bin and then the y bin
+    """
+    low_limit, high_limit = limits
+
+    if fast_histogram is None:
+        counts, _, _ = np.histogram2d(x, y, bins=bins,
+                                      range=(limits, limits))
+        return counts
+
+    high_limit = np.nextafter(high_limit, np.inf)
+    limits = low_limit, high_limit
+
+    return fast_histogram.histogram2d(x, y, bins=bins, range=(limits, limits))
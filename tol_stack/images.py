@@ -0,0 +1,46 @@
+from pathlib import Path
+from typing import List, Union
+
+from PIL import Image
+
+
+def to_image_paths(image_paths: Union[str, Path, List[Union[str, Path]]]) \
+        -> List[Path]:
+    """
+    Converts a single path or a list of paths, each of which may be a
+    string, into a list of paths.  The images themselves are only opened
+    once they are needed, but missing files are reported immediately.
+
+    :param image_paths: a single path or a list of paths to images
+    :return: a list of paths, or ``None`` when no paths are specified
+    """
+    if image_paths is None:
+        return None
+
+    if not isinstance(image_paths, list):
+        image_paths = [image_paths]
+    image_paths = [Path(ip) for ip in image_paths]
+
+    for ip in image_paths:
+        if not ip.exists():
+            raise FileNotFoundError(f'image "{ip}" does not exist')
+
+    return image_paths
+
+
+def open_images(image_paths: List[Path]) -> List[Image.Image]:
+    """
+    Opens the images for display within a report.  As the images are
+    scaled down to fit the page, JPEGs are decoded at a reduced scale,
+    which is much faster, while retaining their mode.
+
+    :param image_paths: a list of paths to images
+    :return: a list of images
+    """
+    images = []
+    for ip in image_paths:
+        image = Image.open(ip)
+        image.draft(image.mode, (800, 800))
+        images.append(image)
+
+    return images
@@ -1,13 +1,15 @@
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 import matplotlib.pyplot
 import matplotlib.pyplot as plt
 import numpy as np
-from PIL import Image
+from scipy.stats import norm, skewnorm, truncnorm
 
 import tol_stack.distributions as distributions
+from tol_stack.histogram import show_histogram
+from tol_stack.images import open_images, to_image_paths
 
 
 class Part:
@@ -41,7 +43,20 @@ class Part:
     right skew; as skewiness increases, so does the skew of the distribution
     :param image_path: the Path to an image, such as a PNG, which shows
     the dimension(s)
+    :param rng: the random generator from which samples are drawn; when \
+    the part is added to a ``StackPath``, the stack path generator is used; \
+    samples are not drawn from the global ``np.random`` state, so \
+    ``np.random.seed()`` has no effect: for repeatable samples, pass a \
+    seeded generator, such as ``np.random.default_rng(1234)``, or specify \
+    the ``seed`` of the ``StackPath``
+    :param stratified: when True, the lengths are sampled in equally-likely \
+    strata of the distribution (Latin hypercube sampling) rather than \
+    entirely at random, which reaches the same accuracy with fewer samples
+    :param dtype: the floating-point type of the length samples; the \
+    concentricity samples are of the matching complex type
     """
+    scatter_max = 10000
+
     def __init__(self, name: str,
                  distribution: str = 'norm',
                  size: int = 100000,
@@ -55,6 +70,9 @@ class Part:
                  comment: str = None,
                  skewiness: float = None,
                  image_paths: [str, List[str], Path, List[Path]] = None,
+                 rng: np.random.Generator = None,
+                 stratified: bool = False,
+                 dtype: np.dtype = np.float64,
                  loglevel=logging.INFO):
         self._logger = logging.getLogger(self.__class__.__name__)
         self._logger.setLevel(loglevel)
@@ -81,26 +99,17 @@ class Part:
         self._limits = limits
         self._size = size
         self._skewiness = skewiness
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self._stratified = stratified
+        self._dtype = np.dtype(dtype)
 
-        if image_paths is not None:
-            if isinstance(image_paths, list):
-                image_paths = [Path(ip) if isinstance(ip, str) else ip for ip in image_paths]
-            else:
-                if isinstance(image_paths, str):
-                    image_paths = [Path(image_paths)]
-                else:
-                    image_paths = [image_paths]
-
-            if image_paths is not None:
-                if isinstance(image_paths, list):
-                    self.images = [Image.open(ip) for ip in image_paths]
-                else:
-                    raise ValueError('image_paths must be of type `Path` or `List[Path]`')
-        else:
-            self.images = None
+        # images are only opened once they are needed, such as for a report
+        self._image_paths = to_image_paths(image_paths)
+        self._images = None
 
         self.lengths = None
         self.concentricities = None
+        self._refreshed_config = None
 
         self.refresh()
 
@@ -116,14 +125,81 @@ class Part:
         string += '>'
         return string
 
+    @property
+    def images(self):
+        if self._images is None and self._image_paths is not None:
+            self._images = open_images(self._image_paths)
+
+        return self._images
+
+    @images.setter
+    def images(self, images: list):
+        # assigned images replace any which would be opened from the paths
+        self._image_paths = None
+        self._images = images
+
+    @property
+    def is_stale(self):
+        """
+        True when the part configuration has changed since the samples
+        were last generated.
+        """
+        return self._config() != self._refreshed_config
+
+    def _config(self):
+        return (self.distribution, self.nominal_length, self.tolerance,
+                self.concentricity, self.runout, self._limits,
+                self._skewiness, self._size, self._rng, self._stratified,
+                self._dtype)
+
     @staticmethod
     def retrieve_distributions():
         return ['norm', 'norm-screened', 'norm-notched',
                 'norm-lt', 'norm-gt', 'skew-norm']
 
+    def invalidate(self):
+        """
+        Marks the samples as out of date so that they are generated again
+        on the next refresh, even though the configuration is unchanged.
+
+        :return: None
+        """
+        self._refreshed_config = None
+
     def set_size(self, size: int):
         self._size = size
 
+    def set_rng(self, rng: np.random.Generator):
+        self._rng = rng
+
+    def set_stratified(self, stratified: bool):
+        self._stratified = stratified
+
+    def set_dtype(self, dtype: np.dtype):
+        self._dtype = np.dtype(dtype)
+
+    def sampling_params(self) -> dict:
+        """
+        Returns the arguments from which an equivalent part may be created,
+        without any samples or images, such as for sampling the part in
+        another process.
+
+        :return: a dict of keyword arguments for ``Part``
+        """
+        return {
+            'name': self.name,
+            'distribution': self.distribution,
+            'size': self._size,
+            'nominal_length': self.nominal_length,
+            'tolerance': self.tolerance,
+            'concentricity': self.concentricity,
+            'runout': self.runout,
+            'limits': self._limits,
+            'skewiness': self._skewiness,
+            'stratified': self._stratified,
+            'dtype': self._dtype
+        }
+
     def to_dict(self):
         return {
             'name': self.name,
@@ -132,36 +208,146 @@ class Part:
             'tolerance': self.tolerance
         }
 
-    def refresh(self, size: int = None):
+    def _length_bounds(self) -> List[Tuple[float, float]]:
+        """
+        The screened distributions are truncated normal distributions;
+        returns the sections of the normal distribution which are retained,
+        expressed as bounds in standard deviations from the nominal.
+        """
+        loc, scale = self.nominal_length, self.tolerance / 3
+
+        if isinstance(self._limits, tuple):
+            limit, *_ = self._limits
+        else:
+            limit = self._limits
+
+        if self.distribution == 'norm-screened' and self._limits is not None:
+            low_limit, high_limit = self._limits
+            return [((low_limit - loc) / scale, (high_limit - loc) / scale)]
+        elif self.distribution == 'norm-notched' and self._limits is not None:
+            low_limit, high_limit = self._limits
+            return [(-np.inf, (low_limit - loc) / scale),
+                    ((high_limit - loc) / scale, np.inf)]
+        elif self.distribution == 'norm-lt':
+            return [(-np.inf, (limit - loc) / scale)]
+        elif self.distribution == 'norm-gt':
+            return [((limit - loc) / scale, np.inf)]
+
+        return [(-np.inf, np.inf)]
+
+    def _stratified_lengths(self) -> np.ndarray:
+        """
+        Samples the length distribution by mapping a stratified uniform
+        sampling through the inverse of its cumulative distribution.
+        """
+        loc, scale = self.nominal_length, self.tolerance / 3
+        strata = distributions.stratified_uniform(self._size, rng=self._rng)
+
+        if self.distribution == 'skew-norm':
+            return skewnorm.ppf(strata, self._skewiness, loc=loc, scale=scale)
+
+        # place each stratum within the retained sections of the
+        # normal distribution, then invert the normal distribution
+        bounds = np.array(self._length_bounds())
+        lows, highs = norm.cdf(bounds[:, 0]), norm.cdf(bounds[:, 1])
+        widths = highs - lows
+        ends = np.cumsum(widths)
+
+        probabilities = strata * ends[-1]
+        sections = np.searchsorted(ends, probabilities, side='right')
+        sections = np.minimum(sections, len(ends) - 1)
+        probabilities += lows[sections] - (ends[sections] - widths[sections])
+
+        return loc + scale * norm.ppf(probabilities)
+
+    def length_moments(self) -> Tuple[float, float]:
+        """
+        Calculates the mean and standard deviation of the length
+        distribution directly from its parameters, rather than from
+        the samples.
+
+        :return: a tuple containing the mean and the standard deviation
+        """
+        if self.nominal_length is None:
+            raise AttributeError('this part has no length attributes')
+
+        loc, scale = self.nominal_length, self.tolerance / 3
+
+        if self.distribution == 'skew-norm':
+            mean, var = skewnorm.stats(self._skewiness, loc=loc, scale=scale,
+                                       moments='mv')
+            return float(mean), float(np.sqrt(var))
+
+        bounds = self._length_bounds()
+        if bounds == [(-np.inf, np.inf)]:
+            return loc, scale
+
+        # combine the moments of each retained section of the
+        # distribution, weighted by the probability of that section
+        weights, means, second_moments = [], [], []
+        for a, b in bounds:
+            weights.append(norm.cdf(b) - norm.cdf(a))
+            m, v = truncnorm.stats(a, b, loc=loc, scale=scale, moments='mv')
+            means.append(m)
+            second_moments.append(v + m ** 2)
+
+        weights = np.array(weights) / sum(weights)
+        mean = float(np.dot(weights, means))
+        var = float(np.dot(weights, second_moments)) - mean ** 2
+
+        return mean, float(np.sqrt(var))
+
+    def refresh(self, size: int = None, lengths: np.ndarray = None,
+                concentricities: np.ndarray = None):
         """
         Re-calculates the distribution.
 
         :param size: Allows external software to override the size
+        :param lengths: Allows external software to supply length samples \
+        which were already drawn from this part's distribution, such as when \
+        sampling several parts at once
+        :param concentricities: Allows external software to supply \
+        concentricity samples which were already drawn from this part's \
+        distribution, such as when sampling in another process
         :return: None
         """
         if size is not None:
             self._size = size
 
-        if self.nominal_length is not None:
+        if lengths is not None:
+            self.lengths = lengths
+        elif self.nominal_length is not None and self._stratified:
+            self.lengths = self._stratified_lengths()
+        elif self.nominal_length is not None:
             if self.distribution == 'norm':
+                # re-use the existing sample buffer when the size allows
+                if self.lengths is None \
+                        or self.lengths.shape != (self._size,) \
+                        or self.lengths.dtype != self._dtype:
+                    self.lengths = np.empty(self._size, dtype=self._dtype)
+
                 self.lengths = distributions.norm(
                     loc=self.nominal_length,
                     scale=self.tolerance / 3,
-                    size=self._size
+                    size=self._size,
+                    rng=self._rng,
+                    out=self.lengths
                 )
             elif self.distribution == 'norm-screened':
                 self.lengths = distributions.norm_screened(
                     loc=self.nominal_length,
                     scale=self.tolerance / 3,
                     size=self._size,
-                    limits=self._limits
+                    limits=self._limits,
+                    rng=self._rng
                 )
             elif self.distribution == 'norm-notched':
                 self.lengths = distributions.norm_notched(
                     loc=self.nominal_length,
                     scale=self.tolerance / 3,
                     size=self._size,
-                    limits=self._limits
+                    limits=self._limits,
+                    rng=self._rng
                 )
             elif self.distribution == 'norm-lt':
                 if isinstance(self._limits, tuple):
@@ -173,7 +359,8 @@ class Part:
                     loc=self.nominal_length,
                     scale=self.tolerance / 3,
                     size=self._size,
-                    limit=limit
+                    limit=limit,
+                    rng=self._rng
                 )
             elif self.distribution == 'norm-gt':
                 if isinstance(self._limits, tuple):
@@ -185,7 +372,8 @@ class Part:
                     loc=self.nominal_length,
                     scale=self.tolerance / 3,
                     size=self._size,
-                    limit=limit
+                    limit=limit,
+                    rng=self._rng
                 )
 
             elif self.distribution == 'skew-norm':
@@ -193,21 +381,31 @@ class Part:
                     loc=self.nominal_length,
                     scale=self.tolerance / 3,
                     size=self._size,
-                    skewiness=self._skewiness
+                    skewiness=self._skewiness,
+                    rng=self._rng
                 )
 
             else:
                 raise ValueError(f'distribution "{self.distribution}" '
                                  f'appears to be invalid')
 
-        if self.concentricity is not None:
+        # the remaining distributions are only sampled in double precision
+        if lengths is None and self.lengths is not None:
+            self.lengths = self.lengths.astype(self._dtype, copy=False)
+
+        if concentricities is not None:
+            self.concentricities = concentricities
+        elif self.concentricity is not None:
             if self.distribution == 'norm':
                 r = distributions.norm(
                     loc=0,
                     scale=self.concentricity / 3,
-                    size=self._size
+                    size=self._size,
+                    rng=self._rng,
+                    out=np.empty(self._size, dtype=self._dtype)
                 )
-                theta = np.random.uniform(0.0, 2*np.pi, size=self._size)
+                theta = self._rng.random(size=self._size, dtype=self._dtype)
+                theta *= 2*np.pi
                 self.concentricities = r * np.exp(1j*theta)
 
             else:
@@ -218,8 +416,11 @@ class Part:
         if self.runout is not None:
             raise ValueError('runout not currently implemented')
 
+        self._refreshed_config = self._config()
+
     def show_scaled_dist(self, ax: matplotlib.pyplot.Axes, **kwargs):
-        ax.hist(self.lengths, bins=31, **kwargs)
+        bins = kwargs.pop('bins', 31)
+        show_histogram(ax, self.lengths, bins=bins, fill=True, **kwargs)
         if self.nominal_length > 0:
             ax.set_xlim(left=0.0)
         elif self.nominal_length < 0:
@@ -228,7 +429,8 @@ class Part:
         ax.grid()
 
     def show_dist(self, ax: matplotlib.pyplot.Axes, **kwargs):
-        ax.hist(self.lengths, bins=101, **kwargs)
+        bins = kwargs.pop('bins', 101)
+        show_histogram(ax, self.lengths, bins=bins, fill=True, **kwargs)
         ax.grid()
 
     def show_length_dist(self, **kwargs):
@@ -255,16 +457,21 @@ class Part:
         if self.concentricities is None:
             raise AttributeError('this part has no concentricity attributes')
 
+        # the samples are independent, so an evenly-strided subset is
+        # representative while keeping the number of markers bounded
+        step = -(-len(self.concentricities) // self.scatter_max)
+        samples = self.concentricities[::step]
+
         # semi-smart adjustment of alpha
         fig, ax = plt.subplots(dpi=300)
 
-        alpha = 1000 / len(self.concentricities)
+        alpha = 1000 / len(samples)
         alpha = alpha if alpha < 1.0 else 1.0
         alpha = alpha if alpha > 0.1 else 0.1
 
         ax.scatter(
-            self.concentricities.real,
-            self.concentricities.imag,
+            samples.real,
+            samples.imag,
             label='samples',
             s=1.0,
             alpha=alpha
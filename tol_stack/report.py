@@ -94,19 +94,17 @@ class StackupReport(FPDF):
             fig.savefig(buffer, format='png')
             self.image(buffer, w=self.epw)
 
+        # render the stack path plots together so that they share samples
+        images = self.stackpath.render_dists(['part_relative_dists',
+                                              'length_dist'])
+
         # show relative distributions
         self.start_section(name='Relative Part Tolerance Contributions', level=0)
-        buffer = BytesIO()
-        fig = self.stackpath.show_part_relative_dists()
-        fig.savefig(buffer, format='png')
-        self.image(buffer, h=self.epw)
+        self.image(BytesIO(images['part_relative_dists']), h=self.epw)
 
         # create stack path analysis
         self.start_section(name='Stackup Summary', level=0)
-        buffer = BytesIO()
-        fig = self.stackpath.show_length_dist()
-        fig.savefig(buffer, format='png')
-        self.image(buffer, h=self.epw)
+        self.image(BytesIO(images['length_dist']), h=self.epw)
 
         self.output(f'{self.stackpath.name}.pdf')
 
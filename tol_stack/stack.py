@@ -1,14 +1,44 @@
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 import logging
+from multiprocessing import get_context
+import os
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
 from engineering_notation import EngNumber
+from matplotlib.colors import LogNorm
 import matplotlib.pyplot as plt
 import numpy as np
-from PIL import Image
+from scipy.stats import norm
 
+from tol_stack.histogram import histogram, histogram2d, show_histogram
+from tol_stack.images import open_images, to_image_paths
 from tol_stack.part import Part
 
+# below this many samples per part, starting worker processes
+# costs more than sampling the parts serially
+_parallel_size = 1000000
+
+# above this many samples, concentricity is drawn as a density image
+# rather than as a scatter plot
+_scatter_size = 5000
+
+
+def _sample_part(params: dict, seed: int) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    part = Part(**params, rng=np.random.default_rng(seed))
+
+    return part.lengths, part.concentricities
+
+
+def _render(fig: plt.Figure) -> bytes:
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png')
+    plt.close(fig)
+
+    return buffer.getvalue()
+
 
 class StackPath:
     """
@@ -25,6 +55,21 @@ class StackPath:
     :param concentricity: a floating-point number; when present, indicates \
     that the concentricity of the parts is to be stacked and evaluated
     :param size: the number of samples to create
+    :param seed: the seed of the random generator shared by all parts \
+    within the stack path; specify in order to make the analysis repeatable
+    :param stratified: when True, the part lengths are sampled in \
+    equally-likely strata of their distributions (Latin hypercube \
+    sampling), which reaches the same accuracy with a smaller ``size``
+    :param dtype: the floating-point type in which the samples are \
+    stacked; ``np.float32`` halves the memory moved through the analysis, \
+    but only resolves about seven significant digits, so the tolerances \
+    should remain well above ``1e-6`` of the nominal lengths
+    :param parallel: when True, parts which are sampled individually are \
+    sampled in worker processes once ``size`` reaches one million and more \
+    than one CPU is available; the worker processes are started fresh, so \
+    the calling script must guard its entry point with \
+    ``if __name__ == '__main__':``
+    :param dpi: the resolution of the distribution plots, in dots per inch
     :param loglevel: the logging level that is to be implemented for the class
     """
 
@@ -36,11 +81,21 @@ class StackPath:
                  min_length: float = None,
                  concentricity: float = None,
                  size: int = 100000,
+                 seed: int = None,
+                 stratified: bool = False,
+                 dtype: np.dtype = np.float64,
+                 parallel: bool = False,
+                 dpi: int = 300,
                  loglevel=logging.INFO):
         self._logger = logging.getLogger(self.__class__.__name__)
         self._logger.setLevel(loglevel)
 
         self.parts = []
+        self._samples = None
+        self._cumulative = None
+        self._concentricity_stackup = None
+        self._dirty = True
+        self._rng = np.random.default_rng(seed)
 
         self.max_length = max_length
         self.min_length = min_length
@@ -49,26 +104,27 @@ class StackPath:
         self.name = name
         self.description = description
         self.size = size
+        self.stratified = stratified
+        self.dtype = np.dtype(dtype)
+        self.parallel = parallel
+        self.dpi = dpi
 
-        # convert any strings to paths, convert to a list of paths
-        if image_paths is not None:
-            if isinstance(image_paths, list):
-                image_paths = [Path(ip) if isinstance(ip, str) else ip for ip in
-                               image_paths]
-            else:
-                if isinstance(image_paths, str):
-                    image_paths = [Path(image_paths)]
-                else:
-                    image_paths = [image_paths]
-
-            if image_paths is not None:
-                if isinstance(image_paths, list):
-                    self.images = [Image.open(ip) for ip in image_paths]
-                else:
-                    raise ValueError(
-                        'image_paths must be of type `Path` or `List[Path]`')
-        else:
-            self.images = None
+        # images are only opened once they are needed, such as for a report
+        self._image_paths = to_image_paths(image_paths)
+        self._images = None
+
+    @property
+    def images(self):
+        if self._images is None and self._image_paths is not None:
+            self._images = open_images(self._image_paths)
+
+        return self._images
+
+    @images.setter
+    def images(self, images: list):
+        # assigned images replace any which would be opened from the paths
+        self._image_paths = None
+        self._images = images
 
     @property
     def is_length(self):
@@ -87,8 +143,24 @@ class StackPath:
         """
         self._logger.info(f'adding part {part} to stack path')
         part.set_size(self.size)
+        part.set_rng(self._rng)
+        part.set_stratified(self.stratified)
+        part.set_dtype(self.dtype)
 
         self.parts.append(part)
+        self._dirty = True
+
+    def invalidate(self):
+        """
+        Discards the samples of every part so that they are generated
+        again, such as to observe a different random outcome; samples are
+        otherwise only re-generated for parts whose configuration changes.
+
+        :return: None
+        """
+        for part in self.parts:
+            part.invalidate()
+        self._dirty = True
 
     def retrieve_parts(self, safe=True):
         """
@@ -105,14 +177,124 @@ class StackPath:
         return self.parts
 
     def _refresh_parts(self):
-        self._logger.info('refreshing parts...')
+        # the samples of all parts are held as the rows of a single
+        # (parts, size) array and each part's lengths are a view of its row
+        shape = (len(self.parts), self.size)
+        if self._samples is None or self._samples.shape != shape \
+                or self._samples.dtype != self.dtype:
+            self._samples = np.empty(shape, dtype=self.dtype)
+            self._cumulative = np.empty(shape, dtype=self.dtype)
+            self._dirty = True
+
+        # the size may have changed since the parts were added, which
+        # leaves those parts stale
         for part in self.parts:
-            part.refresh()
+            part.set_size(self.size)
+
+        # only parts which have changed since their last refresh
+        # need to be sampled again
+        stale = [i for i, part in enumerate(self.parts) if part.is_stale]
+
+        # parts may also have been resampled elsewhere, such as for the
+        # concentricity plot, leaving their lengths outside of the buffer
+        in_place = all(part.lengths is not None
+                       and part.lengths.base is self._samples
+                       for part in self.parts)
+        if not self._dirty and not stale and in_place:
+            return
+
+        self._logger.info('refreshing parts...')
+
+        # draw the samples for all normally-distributed lengths in a
+        # single call, then scale and offset each row in place
+        batched = [i for i in stale
+                   if not self.stratified
+                   and self.parts[i].distribution == 'norm'
+                   and self.parts[i].nominal_length is not None]
+        if batched:
+            locs = np.array([self.parts[i].nominal_length for i in batched])
+            scales = np.array([self.parts[i].tolerance / 3 for i in batched])
+
+            samples = self._rng.standard_normal((len(batched), self.size),
+                                                dtype=self.dtype)
+            np.multiply(samples, scales[:, None], out=samples)
+            np.add(samples, locs[:, None], out=samples)
+            self._samples[batched] = samples
+
+        for i in batched:
+            self.parts[i].refresh(lengths=self._samples[i])
+        self._sample_parts([self.parts[i] for i in stale if i not in batched])
+
+        for row, part in zip(self._samples, self.parts):
             if part.lengths is None:
                 raise AttributeError(f'part "{part.name}" does not '
                                      f'have a proper length specification')
+
+            if part.lengths.base is not self._samples:
+                row[:] = part.lengths
+                part.lengths = row
+
+        self._dirty = False
         self._logger.info('refresh complete')
 
+    def calculate_length_interference(self) -> Tuple[float, float]:
+        """
+        Calculates the fraction of stackups expected to fall below the
+        minimum length and above the maximum length directly from the
+        part distributions, without any sampling.  The stackup is treated
+        as a normal distribution with the combined mean and variance of
+        the parts, which is exact when every part is normally distributed
+        and otherwise approximate.
+
+        :return: a tuple containing the fraction below the minimum length \
+        and the fraction above the maximum length; each is ``None`` when \
+        the corresponding limit is not specified
+        """
+        for part in self.parts:
+            if part.nominal_length is None:
+                raise AttributeError(f'part "{part.name}" does not '
+                                     f'have a proper length specification')
+
+        moments = np.array([part.length_moments() for part in self.parts])
+        mean = moments[:, 0].sum()
+        std = np.sqrt(np.square(moments[:, 1]).sum())
+
+        below, above = None, None
+        if self.min_length is not None:
+            below = float(norm.cdf(self.min_length, loc=mean, scale=std))
+        if self.max_length is not None:
+            above = float(norm.sf(self.max_length, loc=mean, scale=std))
+
+        return below, above
+
+    def render_dists(self, names: List[str] = None) -> Dict[str, bytes]:
+        """
+        Renders distribution plots to PNG images, all of which show the
+        same samples.
+
+        :param names: the plots to render, named after their ``show_`` \
+        methods, such as ``'length_dist'``; when not specified, all plots \
+        applicable to the stack path are rendered
+        :return: a dict of the PNG image data, keyed by plot name
+        """
+        if names is None:
+            names = []
+            if self.is_length:
+                names += ['part_relative_dists', 'length_dist']
+            if self.is_concentricity:
+                names.append('concentricity_dist')
+            if not names:
+                names.append('part_relative_dists')
+
+        # sample once here so that every plot shows the same samples
+        if 'concentricity_dist' in names:
+            self._refresh_concentricities()
+        if any(name != 'concentricity_dist' for name in names):
+            self._refresh_parts()
+
+        return {name: _render(getattr(self, f'show_{name}')())
+                for name in names}
+
     def show_dist(self):
         if self.is_length:
             return self.show_length_dist()
@@ -125,31 +307,25 @@ class StackPath:
         self._refresh_parts()
 
         self._logger.info('creating relative distribution image...')
-        fig, axs = plt.subplots(len(self.parts), figsize=(6, 9), dpi=300,
-                                sharey=True)
+        fig, axs = plt.subplots(len(self.parts), figsize=(6, 9),
+                                dpi=self.dpi, sharey=True,
+                                constrained_layout=True)
         fig.suptitle('Relative Part Distributions')
 
-        for i, part in enumerate(self.parts):
-            part.show_dist(axs[i])
-            axs[i].set_title(part.name)
-
-        # determine the widest max/min range on the plots
-        max_xrange = 0
-        for i, ax in enumerate(axs):
-            x0, x1 = ax.get_xlim()
-            xrange = abs(x0 - x1)
-            if xrange > max_xrange:
-                max_xrange = xrange
+        # determine the widest range of samples, including the margins
+        # that matplotlib would add, directly rather than by autoscaling
+        # each plot and reading back its limits
+        margin = 1 + 2 * plt.rcParams['axes.xmargin']
+        max_xrange = max(np.ptp(part.lengths) for part in self.parts) * margin
 
         # scale the plots appropriately so that relative
         # contributions can be visually observed
-        for i, ax in enumerate(axs):
-            mean = self.parts[i].nominal_length
-            x0 = mean - max_xrange / 2
-            x1 = mean + max_xrange / 2
-            ax.set_xlim(x0, x1)
+        for ax, part in zip(axs, self.parts):
+            mean = part.nominal_length
+            ax.set_xlim(mean - max_xrange / 2, mean + max_xrange / 2)
 
-        fig.tight_layout()
+            part.show_dist(ax)
+            ax.set_title(part.name)
 
         self._logger.info('relative distribution image creation complete!')
         return fig
@@ -160,7 +336,8 @@ class StackPath:
         self._refresh_parts()
 
         self._logger.info('creating length distribution image...')
-        fig, axs = plt.subplots(3, 1, figsize=(6, 9), dpi=300)
+        fig, axs = plt.subplots(3, 1, figsize=(6, 9), dpi=self.dpi,
+                                constrained_layout=True)
 
         axs[0].axvline(0, label='datum', alpha=0.6)
         if self.min_length is not None and self.max_length is not None:
@@ -169,23 +346,18 @@ class StackPath:
 
         num_of_parts = len(self.parts)
 
-        # determine rough plot length to size the arrow heads
-        head_width = new_width = 0
-        for part in self.parts:
-            new_width += part.nominal_length
-            if new_width > head_width:
-                head_width = new_width
-        head_width *= 0.05
+        # each arrow runs from the running sum of the preceding nominal
+        # lengths; the furthest extent sizes the arrow heads
+        nominals = np.array([part.nominal_length for part in self.parts])
+        ends = np.cumsum(nominals)
+        starts = ends - nominals
+        head_width = max(ends.max(), 0) * 0.05
 
         # draw arrows
-        last_part_x = 0
-        for i in range(num_of_parts):
-            part = self.parts[i]
-            axs[0].arrow(y=i, dy=0, x=last_part_x, dx=part.nominal_length,
+        for i, (start, nominal) in enumerate(zip(starts, nominals)):
+            axs[0].arrow(y=i, dy=0, x=start, dx=nominal,
                          width=head_width / 3,
                          length_includes_head=True, head_width=head_width)
-
-            last_part_x = last_part_x + part.nominal_length
         axs[0].set_yticks(range(len(self.parts)))
         axs[0].set_yticklabels([part.name for part in self.parts])
         axs[0].invert_yaxis()
@@ -194,11 +366,28 @@ class StackPath:
 
         # draw datum, then distributions of added errors.
         axs[1].axvline(0, label='datum', alpha=0.6)
-        finals = np.zeros(len(self.parts[0].lengths))
-        for i in range(num_of_parts):
-            part = self.parts[i]
-            finals += part.lengths
-            axs[1].hist(finals, histtype='step', bins=31, label=f'{part.name}')
+        # the running sums through each part are written into the stack
+        # path's persistent buffer, a whole row at a time, which is several
+        # times faster than np.cumsum along the first axis; the last row
+        # is the final stackup
+        cumulative = self._cumulative
+        np.copyto(cumulative[0], self._samples[0])
+        for i in range(1, num_of_parts):
+            np.add(cumulative[i - 1], self._samples[i], out=cumulative[i])
+
+        # each running sum is binned over its own range, as the sums may
+        # lie far apart from each other along the stack, and is drawn as a
+        # density so that the heights of the distributions are comparable
+        for part, partial in zip(self.parts[:-1], cumulative[:-1]):
+            show_histogram(axs[1], partial, density=True,
+                           label=f'{part.name}')
+
+        # the final stackup is binned once, over the same edges for both
+        # this plot and the final stackup plot
+        finals = cumulative[-1]
+        counts, edges = histogram(finals)
+        axs[1].stairs(counts / (finals.size * np.diff(edges)), edges,
+                      label=f'{self.parts[-1].name}')
 
         # place green/red zones on length stackup
         if self.min_length is not None and self.max_length is not None:
@@ -208,99 +397,155 @@ class StackPath:
         axs[1].legend(bbox_to_anchor=(1.04, 1), loc="upper left")
         axs[1].set_title(f'Distribution by Length')
 
-        axs[2].hist(finals, histtype='step', bins=31,
-                    label='Distribution of final')
-        axs[2].set_title(f'Final Stackup, {EngNumber(len(finals))} Samples')
-
-        if self.min_length is not None:
-            interference = [v for v in finals if v < self.min_length]
-            if len(interference) > 0:
-                interference_percent = 100.0 * len(interference) / len(finals)
-
-                x0, x1 = axs[2].get_xlim()
-                y0, y1 = axs[2].get_ylim()
-                axs[2].axvspan(x0, self.min_length, color='red', zorder=-2,
-                               alpha=0.1)
-                axs[2].axvline(self.min_length, color='red', zorder=-1)
-                axs[2].text(x=self.min_length, y=((y1 - y0) * 0.9),
-                            s=f'{interference_percent:.02f}% below minimum',
-                            color='red', horizontalalignment='right')
-
-        if self.max_length is not None:
-            interference = [v for v in finals if v > self.max_length]
+        # derive the axis limits from the binned final stackup, rather
+        # than asking matplotlib to autoscale after the fact
+        axs[2].stairs(counts, edges, label='Distribution of final')
+        axs[2].set_title(f'Final Stackup, {EngNumber(finals.size)} Samples')
+
+        x0, x1 = edges[0], edges[-1]
+        y0, y1 = 0, counts.max() * 1.05
+        axs[2].set_xlim(x0, x1)
+        axs[2].set_ylim(y0, y1)
+
+        # the minimum and maximum tails only differ by comparison and
+        # placement, so evaluate both from the same table
+        num_of_samples = finals.size
+        tails = (
+            (self.min_length, np.less, (x0, self.min_length),
+             'below minimum', 'right'),
+            (self.max_length, np.greater, (self.max_length, x1),
+             'above maximum', 'left'),
+        )
+        for limit, compare, (span0, span1), description, alignment in tails:
+            if limit is None:
+                continue
 
-            if len(interference) > 0:
-                interference_percent = 100.0 * len(interference) / len(finals)
+            num_outside = int(np.count_nonzero(compare(finals, limit)))
+            if num_outside > 0:
+                interference_percent = 100.0 * num_outside / num_of_samples
 
-                x0, x1 = axs[2].get_xlim()
-                y0, y1 = axs[2].get_ylim()
-                axs[2].axvspan(self.max_length, x1, color='red', zorder=-2,
+                axs[2].axvspan(span0, span1, color='red', zorder=-2,
                                alpha=0.1)
-                axs[2].axvline(self.max_length, color='red', zorder=-1)
-                axs[2].text(x=self.max_length, y=((y1 - y0) * 0.9),
-                            s=f'{interference_percent:.02f}% above maximum',
-                            color='red', horizontalalignment='left')
+                axs[2].axvline(limit, color='red', zorder=-1)
+                axs[2].text(x=limit, y=((y1 - y0) * 0.9),
+                            s=f'{interference_percent:.02f}% {description}',
+                            color='red', horizontalalignment=alignment)
 
         for ax in axs:
             ax.grid()
 
-        fig.tight_layout()
-
         self._logger.info('length distribution image complete!')
         return fig
 
-    def show_concentricity_dist(self):
+    def _sample_parts(self, parts: List[Part]):
+        """
+        Refreshes each of the parts, spreading them across worker processes
+        when requested and there are enough samples to outweigh the cost
+        of doing so.
+
+        :param parts: the parts to refresh
+        :return: None
+        """
+        # each part draws from its own generator, seeded from the stack
+        # path generator, whether or not worker processes are used, so
+        # that seeded results are repeatable on any machine; only the
+        # distribution parameters are sent, never the existing samples
+        seeds = self._rng.integers(2**63, size=len(parts))
+        params = [part.sampling_params() for part in parts]
+
+        if self.parallel and len(parts) > 1 and self.size >= _parallel_size \
+                and (os.cpu_count() or 1) > 1:
+            self._logger.info('sampling parts in worker processes...')
+            with ProcessPoolExecutor(mp_context=get_context('spawn')) \
+                    as executor:
+                results = list(executor.map(_sample_part, params, seeds))
+        else:
+            results = map(_sample_part, params, seeds)
+
+        for part, (lengths, concentricities) in zip(parts, results):
+            part.refresh(lengths=lengths, concentricities=concentricities)
+
+    def _refresh_concentricities(self):
+        self._logger.info('refreshing parts...')
+        self._sample_parts([part for part in self.parts if part.is_stale])
         for part in self.parts:
-            part.refresh()
             if part.concentricities is None:
                 raise AttributeError(f'part "{part.name}" does not '
                                      f'have a proper concentricity specification')
+        self._logger.info('refresh complete')
+
+    def _show_concentricity_samples(self, ax: plt.Axes, samples: np.ndarray,
+                                    radii: np.ndarray, label: str = None):
+        if samples.size < _scatter_size:
+            ax.scatter(samples.real, samples.imag, s=0.1, label=label)
+            return
+
+        # with many samples, drawing a density image is far cheaper than
+        # drawing a marker for every sample
+        extent = max(radii.max(), self.max_concentricity)
+        counts = histogram2d(samples.real, samples.imag, bins=256,
+                             limits=(-extent, extent))
+        ax.imshow(counts.T, origin='lower', norm=LogNorm(), zorder=-2,
+                  extent=(-extent, extent, -extent, extent), label=label)
+
+    def show_concentricity_dist(self):
+        self._refresh_concentricities()
 
         self._logger.info('creating concentricity distribution image...')
         fig, axs = plt.subplots(len(self.parts) + 1, 2,
-                                figsize=(16, (len(self.parts) + 1) * 8), dpi=300)
+                                figsize=(16, (len(self.parts) + 1) * 8),
+                                dpi=self.dpi, constrained_layout=True)
+
+        # the limit circle is drawn as a line through precomputed points,
+        # shared by every axis, rather than as a patch for each axis
+        theta = np.linspace(0, 2 * np.pi, 257)
+        circle_x = self.max_concentricity * np.cos(theta)
+        circle_y = self.max_concentricity * np.sin(theta)
+        circle_style = dict(label='tolerance', color='red', alpha=0.5,
+                            zorder=-1)
+
+        # re-use the stack path's accumulator between calls, starting
+        # from the first part rather than clearing it
+        size = len(self.parts[0].concentricities)
+        finals = self._concentricity_stackup
+        if finals is None or finals.size != size:
+            finals = np.empty(size, dtype=np.result_type(self.dtype, 1j))
+            self._concentricity_stackup = finals
+        np.copyto(finals, self.parts[0].concentricities)
 
-        thetas = np.zeros(len(self.parts[0].concentricities))
-        finals = np.zeros(len(self.parts[0].concentricities)) * np.exp(
-            1j * thetas)
         for i, part in enumerate(self.parts):
-            finals += part.concentricities
-            axs[i][0].scatter(
-                part.concentricities.real,
-                part.concentricities.imag,
-                label=f'{part.name}',
-                s=0.1,
-            )
+            if i > 0:
+                np.add(finals, part.concentricities, out=finals)
+
+            # the radii are shared by the sample plot and the histogram
+            radii = np.abs(part.concentricities)
+            self._show_concentricity_samples(axs[i][0], part.concentricities,
+                                             radii, label=f'{part.name}')
             axs[i][0].set_title(f'Concentricity for {part.name}')
 
             # place limit circle on part
-            axs[i][0].add_patch(
-                plt.Circle((0, 0), self.max_concentricity,
-                           fill=False, label='tolerance',
-                           color='red', alpha=0.5, zorder=-1)
-            )
+            axs[i][0].plot(circle_x, circle_y, **circle_style)
 
-            axs[i][1].hist(abs(part.concentricities), bins=31)
+            show_histogram(axs[i][1], radii, fill=True)
 
         # plot final
         axs[-1][0].set_title('Final Concentricity')
-        axs[-1][0].scatter(finals.real, finals.imag, s=0.1)
-        axs[-1][0].add_patch(
-            plt.Circle((0, 0), self.max_concentricity,
-                       fill=False, label='tolerance',
-                       color='red', alpha=0.5, zorder=-1)
-        )
-        axs[-1][1].hist(abs(finals), bins=31)
+        radii = np.abs(finals)
+        self._show_concentricity_samples(axs[-1][0], finals, radii)
+        axs[-1][0].plot(circle_x, circle_y, **circle_style)
+        show_histogram(axs[-1][1], radii, fill=True)
 
         # calculate how many are outside the circle and report as a percent
-        out_of_range = (abs(finals.real) >= self.max_concentricity).sum()
+        out_of_range = int(np.count_nonzero(radii >= self.max_concentricity))
         if out_of_range > 0:
             total = len(finals)
             percent_fail = 100 * out_of_range / total
             axs[-1][0].text(x=0, y=self.max_concentricity,
                             s=f'{percent_fail:.02f}% outside maximum total concentricity',
                             color='red', horizontalalignment='center',
-                            verticalalignment='bottom')
+                            verticalalignment='bottom',
+                            bbox=dict(facecolor='white', alpha=0.8,
+                                      edgecolor='none'))
             axs[-1][1].axvline(self.max_concentricity, color='red')
 
         for i, ax in enumerate(axs):
@@ -311,8 +556,6 @@ class StackPath:
             axs[i][1].set_ylim(0)
             axs[i][1].grid()
 
-        fig.tight_layout()
-
         self._logger.info('concentricity distribution image complete!')
         return fig
 